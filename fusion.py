@@ -15,6 +15,58 @@ except Exception as err:
   print('Failed to import PyCUDA. Running fusion in CPU mode.')
   FUSION_GPU_MODE = 0
 
+# Fast math flags for the integration kernels, leaving out 'nnan' and 'ninf' so
+# that the checks for invalid (non-finite) depth values are not optimized away
+INTEGRATE_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+
+@njit(fastmath=INTEGRATE_FASTMATH, inline='always')
+def integrate_voxel(tsdf_vol, weight_vol, color_vol, mask_vol, color_im, depth_im, mask_im,
+                    cam_intr, inv_cam_pose, vol_origin, voxel_size, trunc_margin, obs_weight, tsdf_scale, x, y, z):
+  """Integrate an RGB-D frame into voxel (x, y, z) of the TSDF, color and mask volumes.
+  """
+  # Voxel grid coordinates to world coordinates
+  pt_x = vol_origin[0] + x * voxel_size
+  pt_y = vol_origin[1] + y * voxel_size
+  pt_z = vol_origin[2] + z * voxel_size
+  # World coordinates to camera coordinates
+  cam_pt_z = inv_cam_pose[2, 0] * pt_x + inv_cam_pose[2, 1] * pt_y + inv_cam_pose[2, 2] * pt_z + inv_cam_pose[2, 3]
+  if cam_pt_z <= 0:
+    return
+  cam_pt_x = inv_cam_pose[0, 0] * pt_x + inv_cam_pose[0, 1] * pt_y + inv_cam_pose[0, 2] * pt_z + inv_cam_pose[0, 3]
+  cam_pt_y = inv_cam_pose[1, 0] * pt_x + inv_cam_pose[1, 1] * pt_y + inv_cam_pose[1, 2] * pt_z + inv_cam_pose[1, 3]
+  # Camera coordinates to image pixels, skip if outside view frustum
+  pix_x = int(np.round(cam_pt_x * cam_intr[0, 0] / cam_pt_z + cam_intr[0, 2]))
+  pix_y = int(np.round(cam_pt_y * cam_intr[1, 1] / cam_pt_z + cam_intr[1, 2]))
+  if pix_x < 0 or pix_x >= depth_im.shape[1] or pix_y < 0 or pix_y >= depth_im.shape[0]:
+    return
+  # Skip invalid depth
+  depth_val = depth_im[pix_y, pix_x]
+  depth_diff = depth_val - cam_pt_z
+  if not np.isfinite(depth_val) or depth_val <= 0 or depth_diff < -trunc_margin:
+    return
+  # Integrate TSDF
+  dist = min(.5, depth_diff / trunc_margin)
+  w_old = np.float32(weight_vol[x, y, z])
+  w_new = w_old + obs_weight
+  weight_vol[x, y, z] = min(w_new, 65535.)
+  tsdf_vol[x, y, z] = np.round((w_old * (tsdf_vol[x, y, z] / tsdf_scale) + obs_weight * dist) / w_new * tsdf_scale)
+  # Integrate color
+  old_color = color_vol[x, y, z]
+  old_b = (old_color >> 16) & 0xFF
+  old_g = (old_color >> 8) & 0xFF
+  old_r = old_color & 0xFF
+  new_color = color_im[pix_y, pix_x]
+  new_b = (new_color >> 16) & 0xFF
+  new_g = (new_color >> 8) & 0xFF
+  new_r = new_color & 0xFF
+  new_b = min(255., np.round((w_old * old_b + obs_weight * new_b) / w_new))
+  new_g = min(255., np.round((w_old * old_g + obs_weight * new_g) / w_new))
+  new_r = min(255., np.round((w_old * old_r + obs_weight * new_r) / w_new))
+  color_vol[x, y, z] = (np.uint32(new_b) << 16) | (np.uint32(new_g) << 8) | np.uint32(new_r)
+  # Integrate mask
+  mask_vol[x, y, z] |= np.uint8(mask_im[pix_y, pix_x])
+
 
 class TSDFVolume:
   """Volumetric TSDF Fusion of RGB-D Images.
@@ -34,71 +86,104 @@ class TSDFVolume:
     self._vol_bnds = vol_bnds
     self._voxel_size = float(voxel_size)
     self._trunc_margin = 5 * self._voxel_size  # truncation on SDF
-    self._color_const = 256 * 256
+    self._tsdf_scale = 32767.  # TSDF values in [-1, 1] are stored as int16
+    self._weight_scale = 64.  # weights are stored as uint16 fixed point (saturating)
 
     # Adjust volume bounds and ensure C-order contiguous
     self._vol_dim = np.ceil((self._vol_bnds[:,1]-self._vol_bnds[:,0])/self._voxel_size).copy(order='C').astype(int)
     self._vol_bnds[:,1] = self._vol_bnds[:,0]+self._vol_dim*self._voxel_size
     self._vol_origin = self._vol_bnds[:,0].copy(order='C').astype(np.float32)
 
+    # Edge length of the cubic thread blocks of the GPU kernel
+    self._block_size = 8
+
     print("Voxel volume size: {} x {} x {} - # points: {:,}".format(
       self._vol_dim[0], self._vol_dim[1], self._vol_dim[2],
       self._vol_dim[0]*self._vol_dim[1]*self._vol_dim[2])
     )
 
-    # Initialize pointers to voxel volume in CPU memory
-    self._tsdf_vol_cpu = np.ones(self._vol_dim).astype(np.float32)
-    # for computing the cumulative moving average of observations per voxel
-    self._weight_vol_cpu = np.zeros(self._vol_dim).astype(np.float32)
-    self._color_vol_cpu = np.zeros(self._vol_dim).astype(np.float32)
-    self._mask_vol_cpu = np.zeros(self._vol_dim).astype(np.float32)
-
     self.gpu_mode = use_gpu and FUSION_GPU_MODE
 
-    # Copy voxel volumes to GPU
+    # Initialize pointers to voxel volume in CPU memory (page-locked in GPU mode
+    # so that readbacks from the device are DMA'd without a pageable staging copy)
+    host_empty = cuda.pagelocked_empty if self.gpu_mode else np.empty
+    vol_shape = tuple(int(d) for d in self._vol_dim)
+    self._tsdf_vol_cpu = host_empty(vol_shape, np.int16)
+    self._color_vol_cpu = host_empty(vol_shape, np.uint32)  # packed as b << 16 | g << 8 | r
+    self._mask_vol_cpu = host_empty(vol_shape, np.uint8)
+    if not self.gpu_mode:
+      self._tsdf_vol_cpu.fill(int(self._tsdf_scale))
+      # for computing the cumulative moving average of observations per voxel
+      # (in GPU mode the weights only live on the device and are never read back)
+      self._weight_vol_cpu = np.zeros(vol_shape, np.uint16)
+      self._color_vol_cpu.fill(0)
+      self._mask_vol_cpu.fill(0)
+
+    # Initialize voxel volumes on GPU
     if self.gpu_mode:
+      # Two streams with their own input buffers, so that uploading a frame
+      # overlaps the integration of the previous one
+      self._n_gpu_buffers = 2
+      self._streams = [cuda.Stream() for _ in range(self._n_gpu_buffers)]
+      self._uploaded = [cuda.Event() for _ in range(self._n_gpu_buffers)]
+      self._integrated = cuda.Event()
+      self._integrated.record(self._streams[0])
+      self._frame_idx = 0
+      # The volumes start out constant, so they are set on the device instead of
+      # uploaded (the host copies are only filled in by get_volume)
+      n_voxels = int(np.prod(self._vol_dim))
       self._tsdf_vol_gpu = cuda.mem_alloc(self._tsdf_vol_cpu.nbytes)
-      cuda.memcpy_htod(self._tsdf_vol_gpu,self._tsdf_vol_cpu)
-      self._weight_vol_gpu = cuda.mem_alloc(self._weight_vol_cpu.nbytes)
-      cuda.memcpy_htod(self._weight_vol_gpu,self._weight_vol_cpu)
+      cuda.memset_d16(self._tsdf_vol_gpu,int(self._tsdf_scale),n_voxels)
+      self._weight_vol_gpu = cuda.mem_alloc(n_voxels*np.dtype(np.uint16).itemsize)
+      cuda.memset_d16(self._weight_vol_gpu,0,n_voxels)
       self._color_vol_gpu = cuda.mem_alloc(self._color_vol_cpu.nbytes)
-      cuda.memcpy_htod(self._color_vol_gpu,self._color_vol_cpu)
+      cuda.memset_d32(self._color_vol_gpu,0,n_voxels)
       self._mask_vol_gpu = cuda.mem_alloc(self._mask_vol_cpu.nbytes)
-      cuda.memcpy_htod(self._mask_vol_gpu,self._mask_vol_cpu)
-
-      # Cuda kernel function (C++)
-      self._cuda_src_mod = SourceModule("""
-        __global__ void integrate(float * tsdf_vol,
-                                  float * weight_vol,
-                                  float * color_vol,
-                                  float * mask_vol,
-                                  float * vol_dim,
-                                  float * vol_origin,
-                                  float * cam_intr,
-                                  float * cam_pose,
-                                  float * other_params,
-                                  float * color_im,
-                                  float * depth_im,
-                                  float * mask_im) {
-          // Get voxel index
-          int gpu_loop_idx = (int) other_params[0];
-          int max_threads_per_block = blockDim.x;
-          int block_idx = blockIdx.z*gridDim.y*gridDim.x+blockIdx.y*gridDim.x+blockIdx.x;
-          int voxel_idx = gpu_loop_idx*gridDim.x*gridDim.y*gridDim.z*max_threads_per_block+block_idx*max_threads_per_block+threadIdx.x;
-          int vol_dim_x = (int) vol_dim[0];
-          int vol_dim_y = (int) vol_dim[1];
-          int vol_dim_z = (int) vol_dim[2];
-          if (voxel_idx > vol_dim_x*vol_dim_y*vol_dim_z)
-              return;
-          // Get voxel grid coordinates (note: be careful when casting)
-          float voxel_x = floorf(((float)voxel_idx)/((float)(vol_dim_y*vol_dim_z)));
-          float voxel_y = floorf(((float)(voxel_idx-((int)voxel_x)*vol_dim_y*vol_dim_z))/((float)vol_dim_z));
-          float voxel_z = (float)(voxel_idx-((int)voxel_x)*vol_dim_y*vol_dim_z-((int)voxel_y)*vol_dim_z);
+      cuda.memset_d8(self._mask_vol_gpu,0,n_voxels)
+
+      # Per-frame input buffers are allocated lazily on the first call to integrate
+      self._gpu_frame_shape = None
+
+      # Cuda kernel function (C++), specialized on the volume parameters that are
+      # fixed after construction so that nvcc can constant-fold them
+      cuda_defines = "".join("#define {} {}\n".format(name, value) for name, value in (
+        ("VOL_DIM_X", int(self._vol_dim[0])),
+        ("VOL_DIM_Y", int(self._vol_dim[1])),
+        ("VOL_DIM_Z", int(self._vol_dim[2])),
+        ("VOL_ORIGIN_X", "{!r}f".format(float(self._vol_origin[0]))),
+        ("VOL_ORIGIN_Y", "{!r}f".format(float(self._vol_origin[1]))),
+        ("VOL_ORIGIN_Z", "{!r}f".format(float(self._vol_origin[2]))),
+        ("VOXEL_SIZE", "{!r}f".format(self._voxel_size)),
+        ("TRUNC_MARGIN", "{!r}f".format(self._trunc_margin)),
+        ("BLOCK_SIZE", self._block_size),
+        ("N_GPU_BUFFERS", self._n_gpu_buffers),
+      ))
+      self._cuda_src_mod = SourceModule(cuda_defines + """
+        // Per-frame camera parameters, one slot per input buffer (each slot is only
+        // rewritten on its own stream, after the kernels that read it)
+        __constant__ float cam_intr_c[N_GPU_BUFFERS][9];
+        __constant__ float cam_pose_c[N_GPU_BUFFERS][16];
+        __constant__ float other_params_c[N_GPU_BUFFERS][3];
+
+        __device__ void integrate_voxel(short * tsdf_vol,
+                                        unsigned short * weight_vol,
+                                        unsigned int * color_vol,
+                                        unsigned char * mask_vol,
+                                        const unsigned char * __restrict__ color_im,
+                                        const float * __restrict__ depth_im,
+                                        const unsigned char * __restrict__ mask_im,
+                                        int buf_idx,
+                                        int voxel_idx,
+                                        float voxel_x,
+                                        float voxel_y,
+                                        float voxel_z) {
+          const float * cam_intr = cam_intr_c[buf_idx];
+          const float * cam_pose = cam_pose_c[buf_idx];
+          const float * other_params = other_params_c[buf_idx];
           // Voxel grid coordinates to world coordinates
-          float voxel_size = other_params[1];
-          float pt_x = vol_origin[0]+voxel_x*voxel_size;
-          float pt_y = vol_origin[1]+voxel_y*voxel_size;
-          float pt_z = vol_origin[2]+voxel_z*voxel_size;
+          float pt_x = VOL_ORIGIN_X+voxel_x*VOXEL_SIZE;
+          float pt_y = VOL_ORIGIN_Y+voxel_y*VOXEL_SIZE;
+          float pt_z = VOL_ORIGIN_Z+voxel_z*VOXEL_SIZE;
           // World coordinates to camera coordinates
           float tmp_pt_x = pt_x-cam_pose[0*4+3];
           float tmp_pt_y = pt_y-cam_pose[1*4+3];
@@ -110,211 +195,254 @@ class TSDFVolume:
           int pixel_x = (int) roundf(cam_intr[0*3+0]*(cam_pt_x/cam_pt_z)+cam_intr[0*3+2]);
           int pixel_y = (int) roundf(cam_intr[1*3+1]*(cam_pt_y/cam_pt_z)+cam_intr[1*3+2]);
           // Skip if outside view frustum
-          int im_h = (int) other_params[2];
-          int im_w = (int) other_params[3];
+          int im_h = (int) other_params[0];
+          int im_w = (int) other_params[1];
           if (pixel_x < 0 || pixel_x >= im_w || pixel_y < 0 || pixel_y >= im_h || cam_pt_z<0)
               return;
-          // Skip invalid depth
-          float depth_value = depth_im[pixel_y*im_w+pixel_x];
-          if (depth_value == 0)
+          // Skip invalid depth (image gathers go through the read-only data cache)
+          int pixel_idx = pixel_y*im_w+pixel_x;
+          float depth_value = __ldg(&depth_im[pixel_idx]);
+          if (depth_value == 0 || !isfinite(depth_value))
               return;
           // Integrate TSDF
-          float trunc_margin = other_params[4];
           float depth_diff = depth_value-cam_pt_z;
-          if (depth_diff < -trunc_margin)
+          if (depth_diff < -TRUNC_MARGIN)
               return;
-          float dist = fmin(0.5f,depth_diff/trunc_margin);
-          float w_old = weight_vol[voxel_idx];
-          float obs_weight = other_params[5];
+          float dist = fmin(0.5f,depth_diff/TRUNC_MARGIN);
+          float w_old = (float) weight_vol[voxel_idx];
+          float obs_weight = other_params[2];
           float w_new = w_old + obs_weight;
-          weight_vol[voxel_idx] = w_new;
-          tsdf_vol[voxel_idx] = (tsdf_vol[voxel_idx]*w_old+obs_weight*dist)/w_new;
+          weight_vol[voxel_idx] = (unsigned short) fmin(w_new,65535.0f);
+          float tsdf_old = tsdf_vol[voxel_idx]*(1.0f/32767.0f);
+          tsdf_vol[voxel_idx] = (short) roundf((tsdf_old*w_old+obs_weight*dist)/w_new*32767.0f);
           // Integrate color
-          float old_color = color_vol[voxel_idx];
-          float old_b = floorf(old_color/(256*256));
-          float old_g = floorf((old_color-old_b*256*256)/256);
-          float old_r = old_color-old_b*256*256-old_g*256;
-          float new_color = color_im[pixel_y*im_w+pixel_x];
-          float new_b = floorf(new_color/(256*256));
-          float new_g = floorf((new_color-new_b*256*256)/256);
-          float new_r = new_color-new_b*256*256-new_g*256;
+          unsigned int old_color = color_vol[voxel_idx];
+          float old_b = (float) ((old_color>>16)&0xFF);
+          float old_g = (float) ((old_color>>8)&0xFF);
+          float old_r = (float) (old_color&0xFF);
+          float new_r = (float) __ldg(&color_im[pixel_idx*3+0]);
+          float new_g = (float) __ldg(&color_im[pixel_idx*3+1]);
+          float new_b = (float) __ldg(&color_im[pixel_idx*3+2]);
           new_b = fmin(roundf((old_b*w_old+obs_weight*new_b)/w_new),255.0f);
           new_g = fmin(roundf((old_g*w_old+obs_weight*new_g)/w_new),255.0f);
           new_r = fmin(roundf((old_r*w_old+obs_weight*new_r)/w_new),255.0f);
-          color_vol[voxel_idx] = new_b*256*256+new_g*256+new_r;
+          color_vol[voxel_idx] = (((unsigned int) new_b)<<16)|(((unsigned int) new_g)<<8)|((unsigned int) new_r);
           // Integrate mask
-          float old_mask = mask_vol[voxel_idx];
-          float new_mask = mask_im[pixel_y*im_w+pixel_x];
-          mask_vol[voxel_idx] = (old_mask + new_mask)/2;
+          mask_vol[voxel_idx] |= __ldg(&mask_im[pixel_idx]);
+        }
+
+        __global__ void integrate(short * tsdf_vol,
+                                  unsigned short * weight_vol,
+                                  unsigned int * color_vol,
+                                  unsigned char * mask_vol,
+                                  const unsigned char * __restrict__ color_im,
+                                  const float * __restrict__ depth_im,
+                                  const unsigned char * __restrict__ mask_im,
+                                  int buf_idx,
+                                  int voxel_x0,
+                                  int voxel_y0,
+                                  int voxel_z0) {
+          // Get voxel grid coordinates (one thread block per voxel block of the subvolume
+          // starting at voxel_x0/y0/z0, with consecutive threads along the contiguous z
+          // axis for coalesced accesses)
+          int voxel_x = voxel_x0+blockIdx.z*BLOCK_SIZE+threadIdx.z;
+          int voxel_y = voxel_y0+blockIdx.y*BLOCK_SIZE+threadIdx.y;
+          int voxel_z = voxel_z0+blockIdx.x*BLOCK_SIZE+threadIdx.x;
+          if (voxel_x >= VOL_DIM_X || voxel_y >= VOL_DIM_Y || voxel_z >= VOL_DIM_Z)
+              return;
+          int voxel_idx = (voxel_x*VOL_DIM_Y+voxel_y)*VOL_DIM_Z+voxel_z;
+          integrate_voxel(tsdf_vol,weight_vol,color_vol,mask_vol,color_im,depth_im,mask_im,
+                          buf_idx,voxel_idx,voxel_x,voxel_y,voxel_z);
         }""")
 
       self._cuda_integrate = self._cuda_src_mod.get_function("integrate")
 
-      # Determine block/grid size on GPU
-      gpu_dev = cuda.Device(0)
-      self._max_gpu_threads_per_block = gpu_dev.MAX_THREADS_PER_BLOCK
-      n_blocks = int(np.ceil(float(np.prod(self._vol_dim))/float(self._max_gpu_threads_per_block)))
-      grid_dim_x = min(gpu_dev.MAX_GRID_DIM_X,int(np.floor(np.cbrt(n_blocks))))
-      grid_dim_y = min(gpu_dev.MAX_GRID_DIM_Y,int(np.floor(np.sqrt(n_blocks/grid_dim_x))))
-      grid_dim_z = min(gpu_dev.MAX_GRID_DIM_Z,int(np.ceil(float(n_blocks)/float(grid_dim_x*grid_dim_y))))
-      self._max_gpu_grid_dim = np.array([grid_dim_x,grid_dim_y,grid_dim_z]).astype(int)
-      self._n_gpu_loops = int(np.ceil(float(np.prod(self._vol_dim))/float(np.prod(self._max_gpu_grid_dim)*self._max_gpu_threads_per_block)))
+      # Determine block size on GPU (one 8x8x8 thread block per voxel block, the grid
+      # is sized per frame to cover the voxels inside the view frustum)
+      self._gpu_block_dim = (self._block_size, self._block_size, self._block_size)
 
-    else:
-      # Get voxel grid coordinates
-      xv, yv, zv = np.meshgrid(
-        range(self._vol_dim[0]),
-        range(self._vol_dim[1]),
-        range(self._vol_dim[2]),
-        indexing='ij'
-      )
-      self.vox_coords = np.concatenate([
-        xv.reshape(1,-1),
-        yv.reshape(1,-1),
-        zv.reshape(1,-1)
-      ], axis=0).astype(int).T
+      # Page-locked staging buffers for the kernel's per-frame parameters, which are
+      # copied into their buffer's slot of the __constant__ arrays
+      self._other_params_pin = [cuda.pagelocked_empty(3, np.float32) for _ in range(self._n_gpu_buffers)]
+      self._cam_intr_pin = [cuda.pagelocked_empty(9, np.float32) for _ in range(self._n_gpu_buffers)]
+      self._cam_pose_pin = [cuda.pagelocked_empty(16, np.float32) for _ in range(self._n_gpu_buffers)]
+      self._other_params_const = self._cuda_src_mod.get_global("other_params_c")[0]
+      self._cam_intr_const = self._cuda_src_mod.get_global("cam_intr_c")[0]
+      self._cam_pose_const = self._cuda_src_mod.get_global("cam_pose_c")[0]
 
-  @staticmethod
-  @njit(parallel=True)
-  def vox2world(vol_origin, vox_coords, vox_size):
-    """Convert voxel grid coordinates to world coordinates.
-    """
-    vol_origin = vol_origin.astype(np.float32)
-    vox_coords = vox_coords.astype(np.float32)
-    cam_pts = np.empty_like(vox_coords, dtype=np.float32)
-    for i in prange(vox_coords.shape[0]):
-      for j in range(3):
-        cam_pts[i, j] = vol_origin[j] + (vox_size * vox_coords[i, j])
-    return cam_pts
+    else:
+      self._cam_intr_buf = np.empty((3, 3), np.float32)
+      self._color_im_packed = np.empty((0, 0), np.uint32)
 
   @staticmethod
-  @njit(parallel=True)
-  def cam2pix(cam_pts, intr):
-    """Convert camera coordinates to pixel coordinates.
+  @njit("void(u1[:,:,:], u4[:,:])", parallel=True, fastmath=True, cache=True)
+  def pack_color(color_im, color_im_packed):
+    """Fold an (H, W, 3) color image into a single channel uint32 image in one pass.
     """
-    intr = intr.astype(np.float32)
-    fx, fy = intr[0, 0], intr[1, 1]
-    cx, cy = intr[0, 2], intr[1, 2]
-    pix = np.empty((cam_pts.shape[0], 2), dtype=np.int64)
-    for i in prange(cam_pts.shape[0]):
-      pix[i, 0] = int(np.round((cam_pts[i, 0] * fx / cam_pts[i, 2]) + cx))
-      pix[i, 1] = int(np.round((cam_pts[i, 1] * fy / cam_pts[i, 2]) + cy))
-    return pix
+    for y in prange(color_im.shape[0]):
+      for x in range(color_im.shape[1]):
+        color_im_packed[y, x] = (
+          (np.uint32(color_im[y, x, 2]) << 16) | (np.uint32(color_im[y, x, 1]) << 8) | np.uint32(color_im[y, x, 0])
+        )
 
   @staticmethod
-  @njit(parallel=True)
-  def integrate_tsdf(tsdf_vol, dist, w_old, obs_weight):
-    """Integrate the TSDF volume.
+  @njit("void(i2[:,:,:], u2[:,:,:], u4[:,:,:], u1[:,:,:], u4[:,:], f4[:,:], u1[:,:], f4[:,:], f8[:,:], f4[:], f8, f8, i8, f8, i8[:], i8[:])",
+        parallel=True, fastmath=INTEGRATE_FASTMATH, cache=True)
+  def integrate_cpu(tsdf_vol, weight_vol, color_vol, mask_vol, color_im, depth_im, mask_im,
+                    cam_intr, inv_cam_pose, vol_origin, voxel_size, trunc_margin, obs_weight, tsdf_scale,
+                    vox_min, vox_max):
+    """Integrate an RGB-D frame into every voxel of the subvolume [vox_min, vox_max) in a single pass.
     """
-    tsdf_vol_int = np.empty_like(tsdf_vol, dtype=np.float32)
-    w_new = np.empty_like(w_old, dtype=np.float32)
-    for i in prange(len(tsdf_vol)):
-      w_new[i] = w_old[i] + obs_weight
-      tsdf_vol_int[i] = (w_old[i] * tsdf_vol[i] + obs_weight * dist[i]) / w_new[i]
-    return tsdf_vol_int, w_new
+    ext_x, ext_y, ext_z = vox_max[0] - vox_min[0], vox_max[1] - vox_min[1], vox_max[2] - vox_min[2]
+    for idx in prange(ext_x * ext_y * ext_z):
+      x = vox_min[0] + idx // (ext_y * ext_z)
+      y = vox_min[1] + (idx // ext_z) % ext_y
+      z = vox_min[2] + idx % ext_z
+      integrate_voxel(tsdf_vol, weight_vol, color_vol, mask_vol, color_im, depth_im, mask_im,
+                      cam_intr, inv_cam_pose, vol_origin, voxel_size, trunc_margin, obs_weight, tsdf_scale, x, y, z)
 
   def integrate(self, color_im, depth_im, mask_im, cam_intr, cam_pose, obs_weight=1.):
     """Integrate an RGB-D frame into the TSDF volume.
 
     Args:
       color_im (ndarray): An RGB image of shape (H, W, 3).
-      depth_im (ndarray): A depth image of shape (H, W).
-      mask_im  (ndarray): A binary mask of shape (H, W).
+      depth_im (ndarray): A depth image of shape (H, W). Pixels with zero or
+        non-finite (NaN, inf) depth are ignored.
+      mask_im  (ndarray): A mask of shape (H, W). uint8 masks are OR-ed into the
+        volume as 8 bit flags. Masks of any other type (including wider integer
+        types such as label images) are treated as binary, i.e. nonzero is 1.
       cam_intr (ndarray): The camera intrinsics matrix of shape (3, 3).
       cam_pose (ndarray): The camera pose (i.e. extrinsics) of shape (4, 4).
       obs_weight (float): The weight to assign for the current observation. A higher
-        value
+        value gives the observation more influence on the fused TSDF, color and
+        mask. Weights are stored in 1/64 fixed point steps: `obs_weight` is rounded
+        to the nearest step, and any weight below 1/64 (~0.0156) is raised to
+        1/64. Accumulated weights saturate at ~1024.
     """
     im_h, im_w = depth_im.shape
 
-    # Fold RGB color image into a single channel image
-    color_im = color_im.astype(np.float32)
-    color_im = np.floor(color_im[...,2]*self._color_const + color_im[...,1]*256 + color_im[...,0])
+    # Bring the inputs to the fixed types the kernels are compiled for. Masks are
+    # accumulated as 8 bit flags (masks other than uint8 are treated as binary, so
+    # that wider integer labels don't wrap around)
+    color_im = np.asarray(color_im).astype(np.uint8, copy=False)
+    depth_im = np.asarray(depth_im).astype(np.float32, copy=False)
+    mask_im = np.asarray(mask_im)
+    if mask_im.dtype != np.uint8:
+      mask_im = (mask_im != 0).view(np.uint8)
+    cam_intr = np.asarray(cam_intr, np.float64)
+    cam_pose = np.asarray(cam_pose, np.float64)
+    obs_weight = min(max(round(obs_weight * self._weight_scale), 1), 65535)
+
+    # Find the subvolume that can be updated by this frame
+    vox_min, vox_max = self._frustum_bounds(depth_im, cam_intr, cam_pose)
+    vox_ext = vox_max - vox_min
 
     if self.gpu_mode:  # GPU mode: integrate voxel volume (calls CUDA kernel)
-      for gpu_loop_idx in range(self._n_gpu_loops):
+      if self._gpu_frame_shape != (im_h, im_w):
+        self._alloc_gpu_frame_buffers(im_h, im_w)
+
+      # Alternate between the input buffers, waiting for the previous uploads
+      # from the chosen one before refilling its page-locked memory
+      buf_idx = self._frame_idx % self._n_gpu_buffers
+      self._frame_idx += 1
+      stream = self._streams[buf_idx]
+      self._uploaded[buf_idx].synchronize()
+
+      # The RGB color image is uploaded as is and unpacked by the kernel
+      np.copyto(self._color_im_pin[buf_idx], color_im.reshape(-1))
+      np.copyto(self._cam_intr_pin[buf_idx], cam_intr.reshape(-1))
+      np.copyto(self._cam_pose_pin[buf_idx], cam_pose.reshape(-1))
+      self._other_params_pin[buf_idx][:] = (im_h, im_w, obs_weight)
+      np.copyto(self._depth_im_pin[buf_idx], depth_im.reshape(-1))
+      np.copyto(self._mask_im_pin[buf_idx], mask_im.reshape(-1))
+      cuda.memcpy_htod_async(int(self._cam_intr_const)+buf_idx*self._cam_intr_pin[buf_idx].nbytes,
+                             self._cam_intr_pin[buf_idx], stream)
+      cuda.memcpy_htod_async(int(self._cam_pose_const)+buf_idx*self._cam_pose_pin[buf_idx].nbytes,
+                             self._cam_pose_pin[buf_idx], stream)
+      cuda.memcpy_htod_async(int(self._other_params_const)+buf_idx*self._other_params_pin[buf_idx].nbytes,
+                             self._other_params_pin[buf_idx], stream)
+      cuda.memcpy_htod_async(self._color_im_gpu[buf_idx], self._color_im_pin[buf_idx], stream)
+      cuda.memcpy_htod_async(self._depth_im_gpu[buf_idx], self._depth_im_pin[buf_idx], stream)
+      cuda.memcpy_htod_async(self._mask_im_gpu[buf_idx], self._mask_im_pin[buf_idx], stream)
+      self._uploaded[buf_idx].record(stream)
+
+      # Kernels on both streams update the same voxel volumes, so wait for the previous frame
+      stream.wait_for_event(self._integrated)
+      if np.all(vox_ext > 0):  # one 8x8x8 thread block per voxel block of the subvolume
+        grid_dim = np.ceil(vox_ext / self._block_size).astype(int)
         self._cuda_integrate(self._tsdf_vol_gpu,
                             self._weight_vol_gpu,
                             self._color_vol_gpu,
                             self._mask_vol_gpu,
-                            cuda.InOut(self._vol_dim.astype(np.float32)),
-                            cuda.InOut(self._vol_origin.astype(np.float32)),
-                            cuda.InOut(cam_intr.reshape(-1).astype(np.float32)),
-                            cuda.InOut(cam_pose.reshape(-1).astype(np.float32)),
-                            cuda.InOut(np.asarray([
-                              gpu_loop_idx,
-                              self._voxel_size,
-                              im_h,
-                              im_w,
-                              self._trunc_margin,
-                              obs_weight
-                            ], np.float32)),
-                            cuda.InOut(color_im.reshape(-1).astype(np.float32)),
-                            cuda.InOut(depth_im.reshape(-1).astype(np.float32)),
-                            cuda.InOut(mask_im.reshape(-1).astype(np.float32)),
-                            block=(self._max_gpu_threads_per_block,1,1),
-                            grid=(
-                              int(self._max_gpu_grid_dim[0]),
-                              int(self._max_gpu_grid_dim[1]),
-                              int(self._max_gpu_grid_dim[2]),
-                            )
+                            self._color_im_gpu[buf_idx],
+                            self._depth_im_gpu[buf_idx],
+                            self._mask_im_gpu[buf_idx],
+                            np.int32(buf_idx),
+                            np.int32(vox_min[0]),
+                            np.int32(vox_min[1]),
+                            np.int32(vox_min[2]),
+                            block=self._gpu_block_dim,
+                            grid=(int(grid_dim[2]), int(grid_dim[1]), int(grid_dim[0])),
+                            stream=stream
         )
-    else:  # CPU mode: integrate voxel volume (vectorized implementation)
-      # Convert voxel grid coordinates to pixel coordinates
-      cam_pts = self.vox2world(self._vol_origin, self.vox_coords, self._voxel_size)
-      cam_pts = rigid_transform(cam_pts, np.linalg.inv(cam_pose))
-      pix_z = cam_pts[:, 2]
-      pix = self.cam2pix(cam_pts, cam_intr)
-      pix_x, pix_y = pix[:, 0], pix[:, 1]
-
-      # Eliminate pixels outside view frustum
-      valid_pix = np.logical_and(pix_x >= 0,
-                  np.logical_and(pix_x < im_w,
-                  np.logical_and(pix_y >= 0,
-                  np.logical_and(pix_y < im_h,
-                  pix_z > 0))))
-      depth_val = np.zeros(pix_x.shape)
-      depth_val[valid_pix] = depth_im[pix_y[valid_pix], pix_x[valid_pix]]
-
-      # Integrate TSDF
-      depth_diff = depth_val - pix_z
-      valid_pts = np.logical_and(depth_val > 0, depth_diff >= -self._trunc_margin)
-      dist = np.minimum(.5, depth_diff / self._trunc_margin)
-      valid_vox_x = self.vox_coords[valid_pts, 0]
-      valid_vox_y = self.vox_coords[valid_pts, 1]
-      valid_vox_z = self.vox_coords[valid_pts, 2]
-      w_old = self._weight_vol_cpu[valid_vox_x, valid_vox_y, valid_vox_z]
-      tsdf_vals = self._tsdf_vol_cpu[valid_vox_x, valid_vox_y, valid_vox_z]
-      valid_dist = dist[valid_pts]
-      tsdf_vol_new, w_new = self.integrate_tsdf(tsdf_vals, valid_dist, w_old, obs_weight)
-      self._weight_vol_cpu[valid_vox_x, valid_vox_y, valid_vox_z] = w_new
-      self._tsdf_vol_cpu[valid_vox_x, valid_vox_y, valid_vox_z] = tsdf_vol_new
-
-      # Integrate color
-      old_color = self._color_vol_cpu[valid_vox_x, valid_vox_y, valid_vox_z]
-      old_b = np.floor(old_color / self._color_const)
-      old_g = np.floor((old_color-old_b*self._color_const)/256)
-      old_r = old_color - old_b*self._color_const - old_g*256
-      new_color = color_im[pix_y[valid_pts],pix_x[valid_pts]]
-      new_b = np.floor(new_color / self._color_const)
-      new_g = np.floor((new_color - new_b*self._color_const) /256)
-      new_r = new_color - new_b*self._color_const - new_g*256
-      new_b = np.minimum(255., np.round((w_old*old_b + obs_weight*new_b) / w_new))
-      new_g = np.minimum(255., np.round((w_old*old_g + obs_weight*new_g) / w_new))
-      new_r = np.minimum(255., np.round((w_old*old_r + obs_weight*new_r) / w_new))
-      self._color_vol_cpu[valid_vox_x, valid_vox_y, valid_vox_z] = new_b*self._color_const + new_g*256 + new_r
-
-      # Integrate mask
-      old_mask = self._mask_vol_cpu[valid_vox_x, valid_vox_y, valid_vox_z]
-      new_mask = mask_im[pix_y[valid_pts], pix_x[valid_pts]]
-      self._mask_vol_cpu[valid_vox_x, valid_vox_y, valid_vox_z] = np.logical_or(old_mask, new_mask)
+      self._integrated.record(stream)
+    else:  # CPU mode: integrate voxel volume (fused Numba kernel)
+      # Fold RGB color image into a single channel image
+      if self._color_im_packed.shape != (im_h, im_w):
+        self._color_im_packed = np.empty((im_h, im_w), np.uint32)
+      self.pack_color(color_im, self._color_im_packed)
+      color_im = self._color_im_packed
+
+      # Integrate TSDF, color and mask
+      np.copyto(self._cam_intr_buf, cam_intr)
+      inv_cam_pose = rigid_inverse(cam_pose)
+      if np.all(vox_ext > 0):  # only the voxels inside the view frustum
+        self.integrate_cpu(self._tsdf_vol_cpu, self._weight_vol_cpu, self._color_vol_cpu, self._mask_vol_cpu,
+                           color_im, depth_im, mask_im, self._cam_intr_buf, inv_cam_pose, self._vol_origin,
+                           self._voxel_size, self._trunc_margin, obs_weight, self._tsdf_scale,
+                           vox_min, vox_max)
+
+  def _frustum_bounds(self, depth_im, cam_intr, cam_pose):
+    """Get the voxel index bounds [min, max) of the subvolume that a depth image can update.
+    """
+    # Non-finite depths are skipped by the kernels, so they don't bound the frustum
+    max_depth = np.max(depth_im, where=np.isfinite(depth_im), initial=0)
+    if max_depth <= 0:
+      return np.zeros(3, np.int64), np.zeros(3, np.int64)
+    # Voxels up to one truncation margin behind the farthest depth are updated, so
+    # the frustum is extended to that depth. Pixel rounding adds up to half a pixel
+    # on its sides, padded here together with one voxel of slack
+    far_depth = max_depth + self._trunc_margin
+    view_frust_pts = get_view_frustum(depth_im, cam_intr, cam_pose, max_depth=far_depth)
+    pad = self._voxel_size + 0.5 * far_depth / min(cam_intr[0, 0], cam_intr[1, 1])
+    vox_min = np.floor((view_frust_pts.min(axis=1) - pad - self._vol_origin) / self._voxel_size)
+    vox_max = np.ceil((view_frust_pts.max(axis=1) + pad - self._vol_origin) / self._voxel_size) + 1
+    vox_min = np.clip(vox_min, 0, self._vol_dim).astype(np.int64)
+    vox_max = np.clip(vox_max, 0, self._vol_dim).astype(np.int64)
+    return vox_min, vox_max
+
+  def _alloc_gpu_frame_buffers(self, im_h, im_w):
+    """Allocate persistent page-locked host and device buffers for (H, W) input images.
+    """
+    cuda.Context.synchronize()
+    self._gpu_frame_shape = (im_h, im_w)
+    self._color_im_pin = [cuda.pagelocked_empty(im_h*im_w*3, np.uint8) for _ in range(self._n_gpu_buffers)]
+    self._color_im_gpu = [cuda.mem_alloc(pin.nbytes) for pin in self._color_im_pin]
+    self._depth_im_pin = [cuda.pagelocked_empty(im_h*im_w, np.float32) for _ in range(self._n_gpu_buffers)]
+    self._depth_im_gpu = [cuda.mem_alloc(pin.nbytes) for pin in self._depth_im_pin]
+    self._mask_im_pin = [cuda.pagelocked_empty(im_h*im_w, np.uint8) for _ in range(self._n_gpu_buffers)]
+    self._mask_im_gpu = [cuda.mem_alloc(pin.nbytes) for pin in self._mask_im_pin]
 
   def get_volume(self):
     if self.gpu_mode:
-      cuda.memcpy_dtoh(self._tsdf_vol_cpu, self._tsdf_vol_gpu)
-      cuda.memcpy_dtoh(self._color_vol_cpu, self._color_vol_gpu)
-      cuda.memcpy_dtoh(self._mask_vol_cpu, self._mask_vol_gpu)
-    return self._tsdf_vol_cpu, self._color_vol_cpu, self._mask_vol_cpu
+      stream = self._streams[0]
+      stream.wait_for_event(self._integrated)
+      cuda.memcpy_dtoh_async(self._tsdf_vol_cpu, self._tsdf_vol_gpu, stream)
+      cuda.memcpy_dtoh_async(self._color_vol_cpu, self._color_vol_gpu, stream)
+      cuda.memcpy_dtoh_async(self._mask_vol_cpu, self._mask_vol_gpu, stream)
+      stream.synchronize()
+    tsdf_vol = self._tsdf_vol_cpu / np.float32(self._tsdf_scale)
+    return tsdf_vol, self._color_vol_cpu, self._mask_vol_cpu
 
   def get_point_cloud(self):
     """Extract a point cloud from the voxel volume.
@@ -322,18 +450,14 @@ class TSDFVolume:
     tsdf_vol, color_vol, mask_vol = self.get_volume()
 
     # Marching cubes
-    verts = measure.marching_cubes(tsdf_vol, mask=np.logical_and(tsdf_vol > -0.5,tsdf_vol < 0.5), level=0)[0]
+    verts = masked_marching_cubes(tsdf_vol, np.logical_and(tsdf_vol > -0.5,tsdf_vol < 0.5))[0]
     # verts = measure.marching_cubes(tsdf_vol, level=0)[0]
     verts_ind = np.round(verts).astype(int)
     verts = verts*self._voxel_size + self._vol_origin
 
     # Get vertex colors
     rgb_vals = color_vol[verts_ind[:, 0], verts_ind[:, 1], verts_ind[:, 2]]
-    colors_b = np.floor(rgb_vals / self._color_const)
-    colors_g = np.floor((rgb_vals - colors_b*self._color_const) / 256)
-    colors_r = rgb_vals - colors_b*self._color_const - colors_g*256
-    colors = np.floor(np.asarray([colors_r, colors_g, colors_b])).T
-    colors = colors.astype(np.uint8)
+    colors = unpack_color(rgb_vals)
 
     # Get mask
     mask = mask_vol[verts_ind[:, 0], verts_ind[:, 1], verts_ind[:, 2]].reshape((-1, 1))
@@ -347,34 +471,69 @@ class TSDFVolume:
     tsdf_vol, color_vol, mask_vol = self.get_volume()
 
     # Marching cubes
-    verts, faces, norms, vals = measure.marching_cubes(tsdf_vol, mask=np.logical_and(tsdf_vol > -0.8,tsdf_vol < 0.8), level=0)
+    verts, faces, norms, vals = masked_marching_cubes(tsdf_vol, np.logical_and(tsdf_vol > -0.8,tsdf_vol < 0.8))
     verts_ind = np.round(verts).astype(int)
     verts = verts*self._voxel_size+self._vol_origin  # voxel grid coordinates to world coordinates
 
     # Get vertex colors
     rgb_vals = color_vol[verts_ind[:,0], verts_ind[:,1], verts_ind[:,2]]
-    colors_b = np.floor(rgb_vals/self._color_const)
-    colors_g = np.floor((rgb_vals-colors_b*self._color_const)/256)
-    colors_r = rgb_vals-colors_b*self._color_const-colors_g*256
-    colors = np.floor(np.asarray([colors_r,colors_g,colors_b])).T
-    colors = colors.astype(np.uint8)
+    colors = unpack_color(rgb_vals)
     return verts, faces, norms, colors
 
 
+def masked_marching_cubes(tsdf_vol, mask):
+  """Run marching cubes at level 0 over the masked voxels only.
+
+  The volume is cropped to the bounding box of the mask first, so the
+  (typically mostly empty) rest of the volume is never scanned.
+  """
+  if not mask.any():
+    return measure.marching_cubes(tsdf_vol, mask=mask, level=0)
+  # Cubes are kept based on the mask at one of their corners, so the crop is
+  # padded by one voxel on each side to keep every cube touching the mask
+  crop = []
+  for axis in range(3):
+    other_axes = tuple(a for a in range(3) if a != axis)
+    idx = np.flatnonzero(mask.any(axis=other_axes))
+    crop.append(slice(max(idx[0] - 1, 0), min(idx[-1] + 2, mask.shape[axis])))
+  crop = tuple(crop)
+  verts, faces, norms, vals = measure.marching_cubes(tsdf_vol[crop], mask=mask[crop], level=0)
+  verts += np.array([c.start for c in crop], dtype=verts.dtype)
+  return verts, faces, norms, vals
+
+
+def unpack_color(rgb_vals):
+  """Split packed (b << 16 | g << 8 | r) colors into an (N, 3) uint8 array of RGB values.
+  """
+  return np.stack([rgb_vals & 0xFF, (rgb_vals >> 8) & 0xFF, (rgb_vals >> 16) & 0xFF], axis=1).astype(np.uint8)
+
+
 def rigid_transform(xyz, transform):
   """Applies a rigid transform to an (N, 3) pointcloud.
   """
-  xyz_h = np.hstack([xyz, np.ones((len(xyz), 1), dtype=np.float32)])
-  xyz_t_h = np.dot(transform, xyz_h.T).T
-  return xyz_t_h[:, :3]
+  return np.dot(xyz, transform[:3, :3].T) + transform[:3, 3]
+
+
+def rigid_inverse(transform):
+  """Inverts a (4, 4) rigid transform analytically.
+  """
+  rot_t = transform[:3, :3].T
+  inv_transform = np.eye(4, dtype=transform.dtype)
+  inv_transform[:3, :3] = rot_t
+  inv_transform[:3, 3] = -np.dot(rot_t, transform[:3, 3])
+  return inv_transform
 
 
-def get_view_frustum(depth_im, cam_intr, cam_pose):
+def get_view_frustum(depth_im, cam_intr, cam_pose, max_depth=None):
   """Get corners of 3D camera view frustum of depth image
+
+  The frustum extends to `max_depth`, which defaults to the largest finite depth
+  value of the image.
   """
   im_h = depth_im.shape[0]
   im_w = depth_im.shape[1]
-  max_depth = np.max(depth_im)
+  if max_depth is None:
+    max_depth = np.max(depth_im, where=np.isfinite(depth_im), initial=0)
   view_frust_pts = np.array([
     (np.array([0,0,0,im_w,im_w])-cam_intr[0,2])*np.array([0,max_depth,max_depth,max_depth,max_depth])/cam_intr[0,0],
     (np.array([0,0,im_h,0,im_h])-cam_intr[1,2])*np.array([0,max_depth,max_depth,max_depth,max_depth])/cam_intr[1,1],
@@ -385,63 +544,74 @@ def get_view_frustum(depth_im, cam_intr, cam_pose):
 
 
 def meshwrite(filename, verts, faces, norms, colors):
-  """Save a 3D mesh to a polygon .ply file.
+  """Save a 3D mesh to a binary polygon .ply file.
   """
-  # Write header
-  ply_file = open(filename,'w')
-  ply_file.write("ply\n")
-  ply_file.write("format ascii 1.0\n")
-  ply_file.write("element vertex %d\n"%(verts.shape[0]))
-  ply_file.write("property float x\n")
-  ply_file.write("property float y\n")
-  ply_file.write("property float z\n")
-  ply_file.write("property float nx\n")
-  ply_file.write("property float ny\n")
-  ply_file.write("property float nz\n")
-  ply_file.write("property uchar red\n")
-  ply_file.write("property uchar green\n")
-  ply_file.write("property uchar blue\n")
-  ply_file.write("element face %d\n"%(faces.shape[0]))
-  ply_file.write("property list uchar int vertex_index\n")
-  ply_file.write("end_header\n")
-
-  # Write vertex list
-  for i in range(verts.shape[0]):
-    ply_file.write("%f %f %f %f %f %f %d %d %d\n"%(
-      verts[i,0], verts[i,1], verts[i,2],
-      norms[i,0], norms[i,1], norms[i,2],
-      colors[i,0], colors[i,1], colors[i,2],
-    ))
+  # Pack vertex and face lists into little endian records
+  vert_data = np.empty(verts.shape[0], dtype=[
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+    ('nx', '<f4'), ('ny', '<f4'), ('nz', '<f4'),
+    ('red', 'u1'), ('green', 'u1'), ('blue', 'u1'),
+  ])
+  vert_data['x'], vert_data['y'], vert_data['z'] = verts[:, 0], verts[:, 1], verts[:, 2]
+  vert_data['nx'], vert_data['ny'], vert_data['nz'] = norms[:, 0], norms[:, 1], norms[:, 2]
+  vert_data['red'], vert_data['green'], vert_data['blue'] = colors[:, 0], colors[:, 1], colors[:, 2]
+  face_data = np.empty(faces.shape[0], dtype=[('n', 'u1'), ('vertex_index', '<i4', (3,))])
+  face_data['n'] = 3
+  face_data['vertex_index'] = faces
 
-  # Write face list
-  for i in range(faces.shape[0]):
-    ply_file.write("3 %d %d %d\n"%(faces[i,0], faces[i,1], faces[i,2]))
+  # Write header
+  ply_file = open(filename,'wb')
+  ply_file.write(b"ply\n")
+  ply_file.write(b"format binary_little_endian 1.0\n")
+  ply_file.write(b"element vertex %d\n"%(verts.shape[0]))
+  ply_file.write(b"property float x\n")
+  ply_file.write(b"property float y\n")
+  ply_file.write(b"property float z\n")
+  ply_file.write(b"property float nx\n")
+  ply_file.write(b"property float ny\n")
+  ply_file.write(b"property float nz\n")
+  ply_file.write(b"property uchar red\n")
+  ply_file.write(b"property uchar green\n")
+  ply_file.write(b"property uchar blue\n")
+  ply_file.write(b"element face %d\n"%(faces.shape[0]))
+  ply_file.write(b"property list uchar int vertex_index\n")
+  ply_file.write(b"end_header\n")
+
+  # Write vertex and face lists
+  ply_file.write(vert_data.tobytes())
+  ply_file.write(face_data.tobytes())
 
   ply_file.close()
 
 
 def pcwrite(filename, xyzrgb):
-  """Save a point cloud to a polygon .ply file.
+  """Save a point cloud to a binary polygon .ply file.
   """
   xyz = xyzrgb[:, :3]
   rgb = xyzrgb[:, 3:6].astype(np.uint8)
 
+  # Pack vertex list into little endian records
+  vert_data = np.empty(xyz.shape[0], dtype=[
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+    ('red', 'u1'), ('green', 'u1'), ('blue', 'u1'),
+  ])
+  vert_data['x'], vert_data['y'], vert_data['z'] = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+  vert_data['red'], vert_data['green'], vert_data['blue'] = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+
   # Write header
-  ply_file = open(filename,'w')
-  ply_file.write("ply\n")
-  ply_file.write("format ascii 1.0\n")
-  ply_file.write("element vertex %d\n"%(xyz.shape[0]))
-  ply_file.write("property float x\n")
-  ply_file.write("property float y\n")
-  ply_file.write("property float z\n")
-  ply_file.write("property uchar red\n")
-  ply_file.write("property uchar green\n")
-  ply_file.write("property uchar blue\n")
-  ply_file.write("end_header\n")
+  ply_file = open(filename,'wb')
+  ply_file.write(b"ply\n")
+  ply_file.write(b"format binary_little_endian 1.0\n")
+  ply_file.write(b"element vertex %d\n"%(xyz.shape[0]))
+  ply_file.write(b"property float x\n")
+  ply_file.write(b"property float y\n")
+  ply_file.write(b"property float z\n")
+  ply_file.write(b"property uchar red\n")
+  ply_file.write(b"property uchar green\n")
+  ply_file.write(b"property uchar blue\n")
+  ply_file.write(b"end_header\n")
 
   # Write vertex list
-  for i in range(xyz.shape[0]):
-    ply_file.write("%f %f %f %d %d %d\n"%(
-      xyz[i, 0], xyz[i, 1], xyz[i, 2],
-      rgb[i, 0], rgb[i, 1], rgb[i, 2],
-    ))
+  ply_file.write(vert_data.tobytes())
+
+  ply_file.close()
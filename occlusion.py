@@ -250,7 +250,7 @@ class OcclusionVolume:
     else:  # CPU mode: integrate voxel volume (vectorized implementation)
       # Convert voxel grid coordinates to pixel coordinates
       cam_pts = self.vox2world(self._vol_origin, self.vox_coords, self._voxel_size)
-      cam_pts = rigid_transform(cam_pts, np.linalg.inv(cam_pose))
+      cam_pts = rigid_transform(cam_pts, rigid_inverse(cam_pose))
       pix_z = cam_pts[:, 2]
       pix = self.cam2pix(cam_pts, cam_intr)
       pix_x, pix_y = pix[:, 0], pix[:, 1]
@@ -342,9 +342,17 @@ class OcclusionVolume:
 def rigid_transform(xyz, transform):
   """Applies a rigid transform to an (N, 3) pointcloud.
   """
-  xyz_h = np.hstack([xyz, np.ones((len(xyz), 1), dtype=np.float32)])
-  xyz_t_h = np.dot(transform, xyz_h.T).T
-  return xyz_t_h[:, :3]
+  return np.dot(xyz, transform[:3, :3].T) + transform[:3, 3]
+
+
+def rigid_inverse(transform):
+  """Inverts a (4, 4) rigid transform analytically.
+  """
+  rot_t = transform[:3, :3].T
+  inv_transform = np.eye(4, dtype=transform.dtype)
+  inv_transform[:3, :3] = rot_t
+  inv_transform[:3, 3] = -np.dot(rot_t, transform[:3, 3])
+  return inv_transform
 
 
 def get_view_frustum(depth_im, cam_intr, cam_pose):
@@ -363,63 +371,74 @@ def get_view_frustum(depth_im, cam_intr, cam_pose):
 
 
 def meshwrite(filename, verts, faces, norms, colors):
-  """Save a 3D mesh to a polygon .ply file.
+  """Save a 3D mesh to a binary polygon .ply file.
   """
-  # Write header
-  ply_file = open(filename,'w')
-  ply_file.write("ply\n")
-  ply_file.write("format ascii 1.0\n")
-  ply_file.write("element vertex %d\n"%(verts.shape[0]))
-  ply_file.write("property float x\n")
-  ply_file.write("property float y\n")
-  ply_file.write("property float z\n")
-  ply_file.write("property float nx\n")
-  ply_file.write("property float ny\n")
-  ply_file.write("property float nz\n")
-  ply_file.write("property uchar red\n")
-  ply_file.write("property uchar green\n")
-  ply_file.write("property uchar blue\n")
-  ply_file.write("element face %d\n"%(faces.shape[0]))
-  ply_file.write("property list uchar int vertex_index\n")
-  ply_file.write("end_header\n")
-
-  # Write vertex list
-  for i in range(verts.shape[0]):
-    ply_file.write("%f %f %f %f %f %f %d %d %d\n"%(
-      verts[i,0], verts[i,1], verts[i,2],
-      norms[i,0], norms[i,1], norms[i,2],
-      colors[i,0], colors[i,1], colors[i,2],
-    ))
+  # Pack vertex and face lists into little endian records
+  vert_data = np.empty(verts.shape[0], dtype=[
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+    ('nx', '<f4'), ('ny', '<f4'), ('nz', '<f4'),
+    ('red', 'u1'), ('green', 'u1'), ('blue', 'u1'),
+  ])
+  vert_data['x'], vert_data['y'], vert_data['z'] = verts[:, 0], verts[:, 1], verts[:, 2]
+  vert_data['nx'], vert_data['ny'], vert_data['nz'] = norms[:, 0], norms[:, 1], norms[:, 2]
+  vert_data['red'], vert_data['green'], vert_data['blue'] = colors[:, 0], colors[:, 1], colors[:, 2]
+  face_data = np.empty(faces.shape[0], dtype=[('n', 'u1'), ('vertex_index', '<i4', (3,))])
+  face_data['n'] = 3
+  face_data['vertex_index'] = faces
 
-  # Write face list
-  for i in range(faces.shape[0]):
-    ply_file.write("3 %d %d %d\n"%(faces[i,0], faces[i,1], faces[i,2]))
+  # Write header
+  ply_file = open(filename,'wb')
+  ply_file.write(b"ply\n")
+  ply_file.write(b"format binary_little_endian 1.0\n")
+  ply_file.write(b"element vertex %d\n"%(verts.shape[0]))
+  ply_file.write(b"property float x\n")
+  ply_file.write(b"property float y\n")
+  ply_file.write(b"property float z\n")
+  ply_file.write(b"property float nx\n")
+  ply_file.write(b"property float ny\n")
+  ply_file.write(b"property float nz\n")
+  ply_file.write(b"property uchar red\n")
+  ply_file.write(b"property uchar green\n")
+  ply_file.write(b"property uchar blue\n")
+  ply_file.write(b"element face %d\n"%(faces.shape[0]))
+  ply_file.write(b"property list uchar int vertex_index\n")
+  ply_file.write(b"end_header\n")
+
+  # Write vertex and face lists
+  ply_file.write(vert_data.tobytes())
+  ply_file.write(face_data.tobytes())
 
   ply_file.close()
 
 
 def pcwrite(filename, xyzrgb):
-  """Save a point cloud to a polygon .ply file.
+  """Save a point cloud to a binary polygon .ply file.
   """
   xyz = xyzrgb[:, :3]
   rgb = xyzrgb[:, 3:].astype(np.uint8)
 
+  # Pack vertex list into little endian records
+  vert_data = np.empty(xyz.shape[0], dtype=[
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+    ('red', 'u1'), ('green', 'u1'), ('blue', 'u1'),
+  ])
+  vert_data['x'], vert_data['y'], vert_data['z'] = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+  vert_data['red'], vert_data['green'], vert_data['blue'] = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+
   # Write header
-  ply_file = open(filename,'w')
-  ply_file.write("ply\n")
-  ply_file.write("format ascii 1.0\n")
-  ply_file.write("element vertex %d\n"%(xyz.shape[0]))
-  ply_file.write("property float x\n")
-  ply_file.write("property float y\n")
-  ply_file.write("property float z\n")
-  ply_file.write("property uchar red\n")
-  ply_file.write("property uchar green\n")
-  ply_file.write("property uchar blue\n")
-  ply_file.write("end_header\n")
+  ply_file = open(filename,'wb')
+  ply_file.write(b"ply\n")
+  ply_file.write(b"format binary_little_endian 1.0\n")
+  ply_file.write(b"element vertex %d\n"%(xyz.shape[0]))
+  ply_file.write(b"property float x\n")
+  ply_file.write(b"property float y\n")
+  ply_file.write(b"property float z\n")
+  ply_file.write(b"property uchar red\n")
+  ply_file.write(b"property uchar green\n")
+  ply_file.write(b"property uchar blue\n")
+  ply_file.write(b"end_header\n")
 
   # Write vertex list
-  for i in range(xyz.shape[0]):
-    ply_file.write("%f %f %f %d %d %d\n"%(
-      xyz[i, 0], xyz[i, 1], xyz[i, 2],
-      rgb[i, 0], rgb[i, 1], rgb[i, 2],
-    ))
+  ply_file.write(vert_data.tobytes())
+
+  ply_file.close()